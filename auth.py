@@ -1,41 +1,53 @@
 import sqlite3
 import hashlib
+import hmac
+import threading
+
+DB_PATH = 'users.db'
+
+# One connection for the whole process: Streamlit runs every rerun on a new thread, so a
+# per-thread connection would be reopened on each interaction. The lock serialises use.
+_lock = threading.Lock()
+_connection = None
+
+def _execute(sql, params=()):
+    """Run one statement on the shared connection and return its rows."""
+    global _connection
+    with _lock:
+        if _connection is None:
+            conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            _connection = conn
+        return _connection.execute(sql, params).fetchall()
 
 def initialize_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''
+    _execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY,
             username TEXT NOT NULL UNIQUE,
             email TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL
+            password BLOB NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return hashlib.sha256(password.encode('utf-8')).digest()
 
 def register_user(username, email, password):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
     try:
-        c.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", (username, email, hash_password(password)))
-        conn.commit()
+        _execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", (username, email, hash_password(password)))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def login_user(username, password):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = ?", (username,))
-    stored_password = c.fetchone()
-    conn.close()
-    if stored_password and stored_password[0] == hash_password(password):
-        return True
-    return False
\ No newline at end of file
+    rows = _execute("SELECT password FROM users WHERE username = ?", (username,))
+    if not rows:
+        return False
+    stored = rows[0][0]
+    if isinstance(stored, str):
+        # Accounts registered before digests were stored as BLOBs hold a hex string
+        stored = bytes.fromhex(stored)
+    return hmac.compare_digest(stored, hash_password(password))
\ No newline at end of file
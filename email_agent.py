@@ -1,5 +1,6 @@
 import smtplib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
@@ -9,12 +10,21 @@ load_dotenv()
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
-def send_email(to_address, subject, body):
-    """Sends an email using the configured SMTP server."""
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        print("Email credentials not configured. Skipping email.")
-        return
+# A single background sender: callers never wait on SMTP, and because every send runs on
+# this one thread it can keep a logged-in session open between emails.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="email")
+_session = None
 
+def _connect():
+    """Open and log in a new SMTP session."""
+    session = smtplib.SMTP('smtp.gmail.com', 587)  # Use your SMTP server
+    session.starttls()  # Enable security
+    session.login(EMAIL_ADDRESS, EMAIL_PASSWORD)  # Login with mail_id and password
+    return session
+
+def _send_email_sync(to_address, subject, body):
+    """Sends an email on the sender thread, reusing the open SMTP session if there is one."""
+    global _session
     try:
         # Set up the MIME
         message = MIMEMultipart()
@@ -22,17 +32,39 @@ def send_email(to_address, subject, body):
         message['To'] = to_address
         message['Subject'] = subject
         message.attach(MIMEText(body, 'plain'))
-
-        # Create SMTP session for sending the mail
-        session = smtplib.SMTP('smtp.gmail.com', 587)  # Use your SMTP server
-        session.starttls()  # Enable security
-        session.login(EMAIL_ADDRESS, EMAIL_PASSWORD)  # Login with mail_id and password
         text = message.as_string()
-        session.sendmail(EMAIL_ADDRESS, to_address, text)
-        session.quit()
+
+        if _session is None:
+            _session = _connect()
+        try:
+            _session.sendmail(EMAIL_ADDRESS, to_address, text)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException) as e:
+            # Servers drop idle sessions, either outright or by answering 421 (closing
+            # channel) to the next command; log in again and retry once
+            if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code != 421:
+                raise
+            try:
+                _session.close()
+            except Exception:
+                pass
+            _session = _connect()
+            _session.sendmail(EMAIL_ADDRESS, to_address, text)
         print(f"Mail Sent to {to_address}")
     except Exception as e:
         print(f"Error sending email: {e}")
+        if _session is not None:
+            try:
+                _session.close()
+            except Exception:
+                pass
+            _session = None
+
+def send_email(to_address, subject, body):
+    """Queues an email for the background sender and returns the send's Future."""
+    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
+        print("Email credentials not configured. Skipping email.")
+        return None
+    return _executor.submit(_send_email_sync, to_address, subject, body)
 
 def send_welcome_email(email, username):
     """Sends a welcome email to a new user."""
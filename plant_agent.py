@@ -1,60 +1,103 @@
-try:
-    from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
-except ImportError:
-    pipeline = None
-    AutoModelForCausalLM = None
-    AutoTokenizer = None
 import os
-from typing import Dict, List, Optional, Any
-import json
-import base64
-import numpy as np
-from PIL import Image
-import io
-import cv2
-
-# LangChain imports
-
-
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-try:
-    from langchain_together import TogetherLLM
-except ImportError:
-    TogetherLLM = None
-try:
-    from langchain_community.llms import Ollama
-except ImportError:
-    Ollama = None
-try:
-    from langchain_cohere import ChatCohere
-except ImportError:
-    ChatCohere = None
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-except ImportError:
-    ChatGoogleGenerativeAI = None
-try:
-    from langchain_mistralai import ChatMistralAI
-except ImportError:
-    ChatMistralAI = None
+from typing import Dict, List, Optional, Any, Tuple, Union
 try:
-    from langchain_perplexity import ChatPerplexity
+    # SIMD base64 codec with the same API as the standard library module
+    import pybase64 as base64
 except ImportError:
-    ChatPerplexity = None
-try:
-    from langchain_huggingface import HuggingFaceHub
-except ImportError:
-    HuggingFaceHub = None
-from langchain_core.prompts import ChatPromptTemplate
+    import base64
+import traceback
+from bisect import bisect_left
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import time
+from datetime import datetime
+from functools import lru_cache
+import importlib
+import requests
+
 from langchain_core.messages import AIMessage
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 # Local imports
-from plant_analysis import PlantImageAnalyzer
+from plant_analysis import PlantImageAnalyzer, band_histogram, decode_for_analysis
+
+def _optional_import(module: str, name: str):
+    """Import name from module on first use, or None if it isn't installed.
+
+    The LLM providers (and transformers for local models) are heavy to import, so only
+    the one an agent is configured for is loaded, when the agent is created.
+    """
+    try:
+        return getattr(importlib.import_module(module), name)
+    except (ImportError, AttributeError):
+        return None
+
+@lru_cache(maxsize=1)
+def _iso_timestamp(epoch_seconds: int) -> str:
+    """Local ISO timestamp for a whole second, formatted once per second."""
+    return datetime.fromtimestamp(epoch_seconds).isoformat()
 
 class PlantCareAgent:
     """Plant Care Agent that works with multiple LLM providers."""
+
+    # Maximum number of prior chat messages sent to the LLM (16 user/assistant turns)
+    MAX_HISTORY_MESSAGES = 32
+
+    # Tips for a plant with no detected issues; a tuple so callers can't mutate the shared copy
+    DEFAULT_CARE_TIPS = (
+        "Your plant looks healthy! Continue with your current care routine.",
+        "Regularly check for pests and remove dead leaves.",
+        "Ensure proper drainage to prevent root rot.",
+    )
+
+    # Healthy-percentage cut-offs and the (status, emoji) for each band between them
+    HEALTH_THRESHOLDS = (40, 70)
+    HEALTH_LEVELS = (
+        ("Unhealthy", "🔴"),
+        ("Moderately Healthy", "🟡"),
+        ("Healthy", "🟢"),
+    )
+
+    # System prompt for chat turns; built once and shared by every chat request
+    CHAT_SYSTEM_MESSAGE = SystemMessage(content="""
+    You are a friendly and knowledgeable plant care assistant. Your name is Flora.
+    Your goal is to help users with all their plant-related questions in a warm and encouraging tone.
+    When responding, consider the user's potential emotional connection to their plants.
+    Provide clear, actionable advice, and always be positive and supportive.
+    If you don't know the answer, it's okay to say so, but offer to find out or suggest where the user can look for more information.
+    
+    Key areas of expertise:
+    - Plant identification and fun facts.
+    - Detailed care instructions (watering, light, soil, fertilizer).
+    - Diagnosing and treating pests and diseases.
+    - Pruning and propagation techniques.
+    - General tips for happy, healthy plants.
+    """)
+
+    # Analyses whose LLM calls all succeeded, kept per agent and keyed by a BLAKE2b hash
+    # of the image bytes
+    ANALYSIS_CACHE_SIZE = 128
+
+    # Care guides kept per agent, keyed by the normalised plant name
+    CARE_CACHE_SIZE = 256
+
+    # Prompt for image-based care recommendations; kept unindented since every
+    # character of it is sent to the LLM
+    RECOMMENDATIONS_PROMPT = (
+        "Based on the following health analysis for a {species} plant, provide 3-5 specific care recommendations:\n"
+        "\n"
+        "Health Analysis:\n"
+        "- Healthy percentage: {healthy:.1f}%\n"
+        "- Yellowing percentage: {yellow:.1f}%\n"
+        "- Browning percentage: {brown:.1f}%\n"
+        "\n"
+        "Disease Analysis: {diseases}\n"
+        "\n"
+        "Please provide actionable recommendations that address the specific issues detected.\n"
+        "Focus on watering, lighting, fertilizing, and any disease treatment if needed."
+    )
     
     def __init__(self, api_key: str = None, provider: str = "openai"):
         """Initialize the PlantCareAgent with the specified provider.
@@ -67,12 +110,20 @@ class PlantCareAgent:
         self.provider = provider
         self.llm = self._initialize_llm()
         self.analyzer = PlantImageAnalyzer()
+        # The agent is shared across sessions and analyses run on worker threads
+        self._analysis_cache = OrderedDict()
+        self._analysis_cache_lock = threading.Lock()
+        # Analyses under way, by cache key, so concurrent requests for one image share a run
+        self._pending_analyses = {}
+        self._care_cache = OrderedDict()
+        self._care_cache_lock = threading.Lock()
     
     def _initialize_llm(self):
         # Final attempt with gemini-pro and pinned dependency
         # Local Hugging Face Transformers (no API key, open source, in-process)
         if self.provider == "local-hf":
-            if pipeline is not None and AutoModelForCausalLM is not None and AutoTokenizer is not None:
+            pipeline = _optional_import("transformers", "pipeline")
+            if pipeline is not None:
                 # Use a small, fast open source model for best compatibility (TinyLlama)
                 model_id = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
                 try:
@@ -97,18 +148,21 @@ class PlantCareAgent:
                 raise ImportError("transformers or torch is not installed. Please install them to use local open source LLMs.")
         """Initialize the language model based on the provider."""
         if self.provider == "openai":
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model="gpt-4o",  # latest stable OpenAI model
                 api_key=self.api_key,
                 temperature=0.7
             )
         elif self.provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
             return ChatAnthropic(
                 model="claude-3-opus-20240229",  # latest Claude 3 Opus
                 anthropic_api_key=self.api_key,
                 temperature=0.7
             )
         elif self.provider == "together":
+            TogetherLLM = _optional_import("langchain_together", "TogetherLLM")
             if TogetherLLM is not None:
                 return TogetherLLM(
                     model="meta-llama/Llama-3-70b-chat-hf",  # Llama 3 70B
@@ -118,9 +172,9 @@ class PlantCareAgent:
             else:
                 raise ImportError("TogetherLLM is not available in this version of langchain_together. Please update your requirements or code.")
         elif self.provider == "ollama":
+            Ollama = _optional_import("langchain_community.llms", "Ollama")
             if Ollama is not None:
                 # Check if Ollama server is running
-                import requests
                 try:
                     resp = requests.get("http://localhost:11434")
                     if resp.status_code != 200:
@@ -139,6 +193,7 @@ class PlantCareAgent:
             else:
                 raise ImportError("Ollama is not available. Please install langchain_community and run an Ollama server.")
         elif self.provider == "cohere":
+            ChatCohere = _optional_import("langchain_cohere", "ChatCohere")
             if ChatCohere is not None:
                 return ChatCohere(
                     model="command-r-plus",  # latest Cohere command model
@@ -148,6 +203,7 @@ class PlantCareAgent:
             else:
                 raise ImportError("ChatCohere is not available. Please install langchain_cohere.")
         elif self.provider == "gemini":
+            ChatGoogleGenerativeAI = _optional_import("langchain_google_genai", "ChatGoogleGenerativeAI")
             if ChatGoogleGenerativeAI is not None:
                return ChatGoogleGenerativeAI(
                    model="gemini-pro",
@@ -157,6 +213,7 @@ class PlantCareAgent:
             else:
                 raise ImportError("ChatGoogleGenerativeAI is not available. Please install langchain_google_genai.")
         elif self.provider == "mistral":
+            ChatMistralAI = _optional_import("langchain_mistralai", "ChatMistralAI")
             if ChatMistralAI is not None:
                 return ChatMistralAI(
                     model="mistral-large-latest",  # latest Mistral model
@@ -166,6 +223,7 @@ class PlantCareAgent:
             else:
                 raise ImportError("ChatMistralAI is not available. Please install langchain_mistralai.")
         elif self.provider == "perplexity":
+            ChatPerplexity = _optional_import("langchain_perplexity", "ChatPerplexity")
             if ChatPerplexity is not None:
                 return ChatPerplexity(
                     model="pplx-70b-online",  # latest Perplexity model
@@ -175,6 +233,7 @@ class PlantCareAgent:
             else:
                 raise ImportError("ChatPerplexity is not available. Please install langchain_perplexity.")
         elif self.provider == "huggingface":
+            HuggingFaceHub = _optional_import("langchain_huggingface", "HuggingFaceHub")
             if HuggingFaceHub is not None:
                 return HuggingFaceHub(
                     repo_id="HuggingFaceH4/zephyr-7b-beta",  # Zephyr 7B Beta is a strong open model
@@ -184,17 +243,19 @@ class PlantCareAgent:
                 raise ImportError("HuggingFaceHub is not available. Please install langchain_huggingface.")
         else:
             # Default to OpenAI if no provider specified
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model="gpt-4o",
                 api_key=self.api_key,
                 temperature=0.7
             )
     
-    def analyze_image(self, image_data: str) -> Dict[str, Any]:
+    def analyze_image(self, image_data: Union[str, bytes, bytearray, memoryview]) -> Dict[str, Any]:
         """Analyze a plant image and return health assessment.
         
         Args:
-            image_data: Base64 encoded image string
+            image_data: Base64 encoded image string or data URL, or the encoded image bytes
+                themselves (bytes, bytearray or memoryview), which skip the base64 decode
             
         Returns:
             Dict containing analysis results
@@ -203,59 +264,115 @@ class PlantCareAgent:
             # Decode base64 image
             if isinstance(image_data, str):
                 if image_data.startswith('data:image'):
-                    # Handle data URL format
-                    img_str = image_data.split(',')[1]
-                    img_bytes = base64.b64decode(img_str)
+                    # Handle data URL format; decode everything after the header's comma
+                    img_bytes = base64.b64decode(image_data[image_data.find(',') + 1:])
                 else:
                     # Assume it's a base64 string
                     img_bytes = base64.b64decode(image_data)
             else:
                 img_bytes = image_data
                 
-            img_array = np.frombuffer(img_bytes, dtype=np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                return {
-                    'status': 'error',
-                    'message': 'Failed to decode image. Please try again with a different image.'
-                }
-            
-            # Detect if a plant is present
-            if not self.analyzer.detect_plant(img):
-                return {
-                    'status': 'error',
-                    'message': 'No plant detected in the image. Please upload a clear photo of a plant.'
-                }
+            # Repeat uploads of the same image skip decoding and the LLM calls
+            cache_key = hashlib.blake2b(img_bytes, digest_size=16).digest()
+            future = None
+            with self._analysis_cache_lock:
+                cached = self._analysis_cache.get(cache_key)
+                if cached is not None:
+                    self._analysis_cache.move_to_end(cache_key)
+                else:
+                    pending = self._pending_analyses.get(cache_key)
+                    if pending is None:
+                        future = self._pending_analyses[cache_key] = Future()
+            if cached is None and future is None:
+                # The same image is already being analyzed (another session, or a repeated
+                # submit); wait for that run instead of starting a second one
+                cached = pending.result()
+                if cached['status'] != 'success':
+                    return cached
+            if cached is not None:
+                summary = {**cached['summary'], 'timestamp': self._get_current_timestamp()}
+                return {**cached, 'summary': summary}
 
-            # Identify plant species
-            species = self._identify_plant_species(image_data)
+            result = {'status': 'error', 'message': 'Image analysis failed. Please try again.'}
+            try:
+                img = decode_for_analysis(img_bytes)
+                # A base64 payload was decoded into a private copy of the bytes; drop it
+                # before the (slow) LLM calls. Raw bytes are the caller's buffer and stay
+                # alive regardless, and the vision call encodes its own base64 copy.
+                del img_bytes
+                result = self._analyze_decoded_image(img, image_data)
+            finally:
+                with self._analysis_cache_lock:
+                    if result['status'] == 'success' and result['llm_complete']:
+                        self._analysis_cache[cache_key] = result
+                        if len(self._analysis_cache) > self.ANALYSIS_CACHE_SIZE:
+                            self._analysis_cache.popitem(last=False)
+                    del self._pending_analyses[cache_key]
+                future.set_result(result)
+            return result
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f'Error analyzing image: {str(e)}\n{traceback.format_exc()}'
+            }
+    
+    def _analyze_decoded_image(self, img, image_data: Union[str, bytes, bytearray, memoryview]) -> Dict[str, Any]:
+        """Run plant detection, the colour analysis and the LLM calls on a decoded image.
 
-            # Analyze the image
-            health_analysis = self.analyzer.analyze_plant_health(img)
-            disease_analysis = self.analyzer.detect_diseases(img)
-            
-            # Generate a summary of the analysis
-            summary = self._generate_analysis_summary(health_analysis, disease_analysis)
-            
-            # Generate care recommendations using LLM
-            recommendations = self._generate_care_recommendations(health_analysis, disease_analysis, species)
-            
+        Args:
+            img: BGR image array from decode_for_analysis, or None if decoding failed
+            image_data: The image as passed to analyze_image, for the species LLM call
+
+        Returns:
+            Dict containing analysis results
+        """
+        if img is None:
             return {
-                'status': 'success',
-                'health_analysis': health_analysis,
-                'disease_analysis': disease_analysis,
-                'summary': summary,
-                'recommendations': recommendations,
-                'species': species,
-                'message': 'Image analyzed successfully.'
+                'status': 'error',
+                'message': 'Failed to decode image. Please try again with a different image.'
             }
-        except Exception as e:
-            import traceback
+        
+        # One colour pass serves both plant detection and the health analysis
+        hist = band_histogram(img)
+
+        # Detect if a plant is present
+        if not self.analyzer.detect_plant(img, hist):
             return {
                 'status': 'error',
-                'message': f'Error analyzing image: {str(e)}\n{traceback.format_exc()}'
+                'message': 'No plant detected in the image. Please upload a clear photo of a plant.'
             }
+
+        # Raw bytes skipped the base64 decode; the vision LLM still needs base64
+        if not isinstance(image_data, str):
+            image_data = base64.b64encode(image_data).decode('ascii')
+
+        # Identify plant species
+        species, species_ok = self._identify_plant_species(image_data)
+
+        # Analyze the image
+        health_analysis = self.analyzer.analyze_plant_health(img, hist)
+        disease_analysis = self.analyzer.detect_diseases(img)
+        
+        # Generate a summary of the analysis
+        summary = self._generate_analysis_summary(health_analysis, disease_analysis)
+        
+        # Generate care recommendations using LLM
+        recommendations, recommendations_ok = self._generate_care_recommendations(
+            health_analysis, disease_analysis, species
+        )
+        
+        return {
+            'status': 'success',
+            # False when either LLM call failed and a fallback was used; such results
+            # are shown but not cached, so the image is retried once the LLM recovers
+            'llm_complete': species_ok and recommendations_ok,
+            'health_analysis': health_analysis,
+            'disease_analysis': disease_analysis,
+            'summary': summary,
+            'recommendations': recommendations,
+            'species': species,
+            'message': 'Image analyzed successfully.'
+        }
     
     def _generate_analysis_summary(self, health_analysis: Dict, disease_analysis: Dict) -> Dict:
         """Generate a summary of the plant health analysis.
@@ -270,15 +387,8 @@ class PlantCareAgent:
         # Determine overall health status
         health_score = health_analysis.get('healthy_percentage', 0)
         
-        if health_score > 70:
-            health_status = "Healthy"
-            health_emoji = "🟢"
-        elif health_score > 40:
-            health_status = "Moderately Healthy"
-            health_emoji = "🟡"
-        else:
-            health_status = "Unhealthy"
-            health_emoji = "🔴"
+        # Count of thresholds strictly below the score picks the status
+        health_status, health_emoji = self.HEALTH_LEVELS[bisect_left(self.HEALTH_THRESHOLDS, health_score)]
         
         # Check for disease indicators
         disease_detected = False
@@ -303,11 +413,21 @@ class PlantCareAgent:
         
         return summary
     
-    def _identify_plant_species(self, image_data: str) -> str:
-        """Identify the plant species using the LLM."""
+    def _identify_plant_species(self, image_data: str) -> Tuple[str, bool]:
+        """Identify the plant species using the LLM.
+
+        Returns:
+            The species description, and whether the LLM call succeeded (False means a
+            placeholder was returned instead)
+        """
         try:
             # Set a flag to indicate a vision model is needed
             self._is_vision_request = True
+            # Data URLs from analyze_image are already in the form the LLM expects
+            if image_data.startswith('data:'):
+                image_url = image_data
+            else:
+                image_url = f"data:image/jpeg;base64,{image_data}"
             # Create a prompt for the LLM
             prompt = "Identify the plant species in this image. Provide the common and scientific name."
             
@@ -317,19 +437,19 @@ class PlantCareAgent:
                     HumanMessage(
                         content=[
                             {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": f"data:image/jpeg;base64,{image_data}"}
+                            {"type": "image_url", "image_url": image_url}
                         ]
                     )
                 ]
             )
-            return response.content.strip()
+            return response.content.strip(), True
         except Exception:
-            return "Could not identify plant species."
+            return "Could not identify plant species.", False
         finally:
             # Reset the flag
             self._is_vision_request = False
 
-    def _generate_care_recommendations(self, health_analysis: Dict, disease_analysis: Dict, species: str) -> List[str]:
+    def _generate_care_recommendations(self, health_analysis: Dict, disease_analysis: Dict, species: str) -> Tuple[List[str], bool]:
         """Generate care recommendations using the LLM.
         
         Args:
@@ -338,33 +458,30 @@ class PlantCareAgent:
             species: The identified plant species
             
         Returns:
-            List of care recommendations
-        """
-        # Create a prompt for the LLM
-        prompt = f"""
-        Based on the following health analysis for a {species} plant, provide 3-5 specific care recommendations:
-        
-        Health Analysis:
-        - Healthy percentage: {health_analysis.get('healthy_percentage', 0):.1f}%
-        - Yellowing percentage: {health_analysis.get('yellow_percentage', 0):.1f}%
-        - Browning percentage: {health_analysis.get('brown_percentage', 0):.1f}%
-        
-        Disease Analysis:
-        {disease_analysis}
-        
-        Please provide actionable recommendations that address the specific issues detected.
-        Focus on watering, lighting, fertilizing, and any disease treatment if needed.
+            List of care recommendations, and whether they came from the LLM (False means
+            the default recommendations were used)
         """
+        # List only diseases with a measurable share, rather than the dict's repr
+        diseases = '; '.join(
+            f"{name.replace('_percentage', '').replace('_', ' ')}: {percentage:.1f}%"
+            for name, percentage in disease_analysis.items() if percentage > 1
+        ) or 'none detected'
+        prompt = self.RECOMMENDATIONS_PROMPT.format(
+            species=species,
+            healthy=health_analysis.get('healthy_percentage', 0),
+            yellow=health_analysis.get('yellow_percentage', 0),
+            brown=health_analysis.get('brown_percentage', 0),
+            diseases=diseases,
+        )
         
         try:
             # Get recommendations from the LLM
             response = self.llm.invoke(prompt)
-            recommendations = response.content.strip().split('\n')
             # Filter out empty lines and return as list
-            return [rec.strip() for rec in recommendations if rec.strip()]
+            return [rec for rec in map(str.strip, response.content.splitlines()) if rec], True
         except Exception as e:
             # Fallback to default recommendations if LLM fails
-            return self._get_default_recommendations(health_analysis, disease_analysis)
+            return self._get_default_recommendations(health_analysis, disease_analysis), False
     
     def _get_default_recommendations(self, health_analysis: Dict, disease_analysis: Dict) -> List[str]:
         """Get default care recommendations when LLM is not available.
@@ -393,45 +510,37 @@ class PlantCareAgent:
         
         # Default care tips
         if not recommendations:
-            recommendations.extend([
-                "Your plant looks healthy! Continue with your current care routine.",
-                "Regularly check for pests and remove dead leaves.",
-                "Ensure proper drainage to prevent root rot."
-            ])
+            return list(self.DEFAULT_CARE_TIPS)
         
         return recommendations
     
     def _get_current_timestamp(self) -> str:
-        """Get current timestamp in ISO format."""
-        from datetime import datetime
-        return datetime.now().isoformat()
+        """Get current timestamp in ISO format, to the second."""
+        return _iso_timestamp(int(time.time()))
     
+    def _build_chat_messages(self, message: str, chat_history: list = None) -> list:
+        """Build the LLM message list for a chat turn from the system prompt, history and message.
+
+        History entries may be {"role", "content"} dicts or LangChain messages.
+        """
+        messages = [self.CHAT_SYSTEM_MESSAGE]
+        if chat_history:
+            # Only the most recent turns are sent so the prompt stays bounded in long chats
+            for msg in list(chat_history)[-self.MAX_HISTORY_MESSAGES:]:
+                if isinstance(msg, BaseMessage):
+                    # Already an LLM message (e.g. from a session's message ring buffer)
+                    messages.append(msg)
+                elif msg["role"] == "user":
+                    messages.append(HumanMessage(content=msg["content"]))
+                elif msg["role"] == "assistant":
+                    messages.append(AIMessage(content=msg["content"])) # Use AIMessage for assistant
+        messages.append(HumanMessage(content=message))
+        return messages
+
     def chat(self, message: str, chat_history: list = None) -> str:
         """Process a chat message and return a response, always forcing UTF-8 encoding for output."""
         try:
-            messages = []
-            messages.append(SystemMessage(content="""
-            You are a friendly and knowledgeable plant care assistant. Your name is Flora.
-            Your goal is to help users with all their plant-related questions in a warm and encouraging tone.
-            When responding, consider the user's potential emotional connection to their plants.
-            Provide clear, actionable advice, and always be positive and supportive.
-            If you don't know the answer, it's okay to say so, but offer to find out or suggest where the user can look for more information.
-            
-            Key areas of expertise:
-            - Plant identification and fun facts.
-            - Detailed care instructions (watering, light, soil, fertilizer).
-            - Diagnosing and treating pests and diseases.
-            - Pruning and propagation techniques.
-            - General tips for happy, healthy plants.
-            """))
-            if chat_history:
-                for msg in chat_history:
-                    if msg["role"] == "user":
-                        messages.append(HumanMessage(content=msg["content"]))
-                    elif msg["role"] == "assistant":
-                        messages.append(AIMessage(content=msg["content"])) # Use AIMessage for assistant
-            messages.append(HumanMessage(content=message))
-            response = self.llm.invoke(messages)
+            response = self.llm.invoke(self._build_chat_messages(message, chat_history))
             # Force UTF-8 encoding/decoding at every step
             if hasattr(response, 'content'):
                 content = response.content
@@ -439,10 +548,34 @@ class PlantCareAgent:
                 content = response
             if isinstance(content, bytes):
                 return content.decode('utf-8', errors='replace')
+            content = str(content)
+            if content.isascii():
+                # Plain ASCII is already valid UTF-8; skip the two full copies below
+                return content
             # If it's a string, re-encode and decode to force UTF-8
-            return str(content).encode('utf-8', errors='replace').decode('utf-8', errors='replace')
+            return content.encode('utf-8', errors='replace').decode('utf-8', errors='replace')
         except Exception as e:
             return f"I encountered an error: {str(e)}. Please try again with a different query."
+
+    def chat_stream(self, message: str, chat_history: list = None):
+        """Process a chat message and yield the response as text chunks as the LLM produces them.
+
+        LLMs without streaming support (the local TinyLlama wrapper) yield the full
+        response as a single chunk.
+        """
+        if not hasattr(self.llm, 'stream'):
+            yield self.chat(message, chat_history)
+            return
+        try:
+            for chunk in self.llm.stream(self._build_chat_messages(message, chat_history)):
+                # Chat models yield message chunks, plain LLMs yield strings
+                content = getattr(chunk, 'content', chunk)
+                if isinstance(content, bytes):
+                    content = content.decode('utf-8', errors='replace')
+                if content:
+                    yield str(content)
+        except Exception as e:
+            yield f"I encountered an error: {str(e)}. Please try again with a different query."
     
     def get_care_instructions(self, plant_type: str) -> str:
         """Get care instructions for a specific plant type.
@@ -453,6 +586,14 @@ class PlantCareAgent:
         Returns:
             Care instructions as a string
         """
+        # Guides don't change between calls; repeat lookups of a plant skip the LLM
+        cache_key = plant_type.strip().lower()
+        with self._care_cache_lock:
+            cached = self._care_cache.get(cache_key)
+            if cached is not None:
+                self._care_cache.move_to_end(cache_key)
+                return cached
+
         # Create a prompt for the LLM
         prompt = f"""
         Provide care instructions for a {plant_type} plant. Include information about:
@@ -469,9 +610,13 @@ class PlantCareAgent:
         try:
             # Get response from the LLM
             response = self.llm.invoke(prompt)
-            return response.content
         except Exception as e:
             return f"Error generating care instructions: {str(e)}"
+        with self._care_cache_lock:
+            self._care_cache[cache_key] = response.content
+            if len(self._care_cache) > self.CARE_CACHE_SIZE:
+                self._care_cache.popitem(last=False)
+        return response.content
 
 # For testing
 if __name__ == "__main__":
@@ -1,36 +1,179 @@
+import io
+import threading
 import cv2
 import numpy as np
+from PIL import Image
+try:
+    from turbojpeg import TurboJPEG
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    # PyTurboJPEG isn't installed or can't load the libturbojpeg shared library
+    _turbo_jpeg = None
+from functools import lru_cache
 from typing import Dict
 
+# Colour bands as (low, high) HSV bounds. Each band owns one bit so a pixel's memberships
+# fit in a single byte and every mask comes out of one pass over the image.
+GREEN, RED_LOW, RED_HIGH, PURPLE, YELLOW, BROWN = (1 << i for i in range(6))
+COLOR_BANDS = {
+    GREEN: ((30, 40, 40), (90, 255, 255)),
+    RED_LOW: ((0, 70, 50), (10, 255, 255)),     # red wraps around the hue circle
+    RED_HIGH: ((170, 70, 50), (180, 255, 255)),
+    PURPLE: ((125, 50, 50), (160, 255, 255)),
+    YELLOW: ((15, 50, 50), (35, 255, 255)),
+    BROWN: ((10, 100, 20), (20, 255, 200)),
+}
+HEALTHY_BANDS = GREEN | RED_LOW | RED_HIGH | PURPLE
+PLANT_BANDS = HEALTHY_BANDS | YELLOW
+
+def _build_band_lut() -> np.ndarray:
+    """Per-channel lookup table mapping each H, S and V value to the bands it falls within."""
+    lut = np.zeros((256, 1, 3), dtype=np.uint8)
+    values = np.arange(256)
+    for bit, (low, high) in COLOR_BANDS.items():
+        for ch in range(3):
+            lut[(values >= low[ch]) & (values <= high[ch]), 0, ch] |= bit
+    return lut
+
+BAND_LUT = _build_band_lut()
+
+# Band statistics are fractions of the image, so they hold at any resolution; larger
+# images are subsampled down to about this many pixels before classification.
+ANALYSIS_PIXELS = 256 * 256
+
+def _band_bits(img: np.ndarray) -> np.ndarray:
+    """Band bits for every pixel of a BGR image, via HSV and the per-channel band LUT."""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    # Work in place so the only full-size buffers are the HSV image and its channels
+    cv2.LUT(hsv, BAND_LUT, dst=hsv)
+    bits, s, v = cv2.split(hsv)
+    cv2.bitwise_and(bits, s, dst=bits)
+    cv2.bitwise_and(bits, v, dst=bits)
+    return bits
+
+_colour_table_lock = threading.Lock()
+_colour_table_cache = None
+
+def _colour_table() -> np.ndarray:
+    """Band bits for all 2^24 BGR colours, indexed by B | G << 8 | R << 16.
+
+    Built on first use by classifying every colour once with the same OpenCV HSV
+    conversion, so lookups match the per-pixel path exactly. Holds 16 MB; it is built
+    one red value (65,536 colours) at a time so the build needs little more than that.
+    """
+    global _colour_table_cache
+    if _colour_table_cache is None:
+        with _colour_table_lock:
+            if _colour_table_cache is None:
+                table = np.empty(1 << 24, dtype=np.uint8)
+                # One 256x256 slab per red value: row is green, column is blue
+                slab = np.empty((256, 256, 3), dtype=np.uint8)
+                slab[..., 0] = np.arange(256, dtype=np.uint8)
+                slab[..., 1] = np.arange(256, dtype=np.uint8)[:, None]
+                for r in range(256):
+                    slab[..., 2] = r
+                    table[r << 16:(r + 1) << 16] = _band_bits(slab).ravel()
+                table.flags.writeable = False
+                _colour_table_cache = table
+    return _colour_table_cache
+
+def band_histogram(img: np.ndarray) -> np.ndarray:
+    """Count pixels per combination of colour bands.
+
+    Returns a 64-entry array where index b holds the number of pixels whose band bits are
+    exactly b, replacing one cv2.inRange pass and one countNonZero per band.
+    """
+    h, w = img.shape[:2]
+    if h * w > ANALYSIS_PIXELS:
+        scale = (ANALYSIS_PIXELS / (h * w)) ** 0.5
+        # Nearest-neighbour picks real pixels, an unbiased sample of the colour mix;
+        # area averaging would blend neighbours into new, less saturated colours
+        img = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_NEAREST)
+    # Pack each pixel into one 24-bit colour code and classify it with a single table lookup
+    codes = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA).view('<u4')[..., 0]
+    codes &= 0xFFFFFF  # clear the alpha byte in place rather than allocating a masked copy
+    bits = _colour_table().take(codes)
+    hist = cv2.calcHist([bits], [0], None, [64], [0, 64])
+    return hist.ravel().astype(np.int64)
+
+JPEG_MAGIC = b'\xff\xd8\xff'
+
+# OpenCV read flags for each scale-down factor libjpeg can apply while decoding
+REDUCED_READS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def _jpeg_scale(w: int, h: int) -> int:
+    """Largest JPEG scale-down factor that still leaves a few times ANALYSIS_PIXELS to sample."""
+    for factor in (8, 4, 2):
+        if (w // factor) * (h // factor) >= 4 * ANALYSIS_PIXELS:
+            return factor
+    return 1
+
+def decode_for_analysis(image_bytes: bytes) -> np.ndarray:
+    """Decode image bytes to BGR, letting libjpeg scale large JPEGs down while decoding.
+
+    The colour statistics are subsampled to ANALYSIS_PIXELS anyway, so JPEGs are decoded at
+    the smallest scale that still leaves a few times that many pixels to sample from.
+    JPEGs go through libjpeg-turbo's TurboJPEG API when PyTurboJPEG is installed.
+    Returns None if the bytes can't be decoded, like cv2.imdecode.
+    """
+    if image_bytes[:3] != JPEG_MAGIC:
+        return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if _turbo_jpeg is not None:
+        try:
+            w, h = _turbo_jpeg.decode_header(image_bytes)[:2]
+            return _turbo_jpeg.decode(image_bytes, scaling_factor=(1, _jpeg_scale(w, h)))
+        except OSError:
+            pass  # leave JPEGs TurboJPEG rejects to OpenCV
+    try:
+        # Image.open only parses the header here; no pixels are decoded
+        with Image.open(io.BytesIO(image_bytes)) as header:
+            w, h = header.size
+    except Exception:
+        w = h = 0
+    return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), REDUCED_READS[_jpeg_scale(w, h)])
+
+BAND_BITS = np.arange(64)
+
+@lru_cache(maxsize=None)
+def _band_mask(bands: int) -> np.ndarray:
+    """Histogram bins belonging to any of the given bands, built once per band set."""
+    mask = (BAND_BITS & bands) != 0
+    mask.flags.writeable = False
+    return mask
+
+def band_count(hist: np.ndarray, bands: int) -> int:
+    """Number of pixels in any of the given bands."""
+    return int(hist[_band_mask(bands)].sum())
+
 class PlantImageAnalyzer:
-    """Performs plant health and disease analysis using OpenCV."""
+    """Performs plant health and disease analysis using OpenCV.
 
-    def detect_plant(self, img: np.ndarray) -> bool:
-        """Detect if a plant is present in the image based on a wider range of plant-like colors."""
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Define a wider range of plant-like colors (greens, reds, purples, yellows)
-        # Green mask
-        green_mask = cv2.inRange(hsv, (30, 40, 40), (90, 255, 255))
-        # Red mask (for red-leafed plants)
-        red_mask1 = cv2.inRange(hsv, (0, 70, 50), (10, 255, 255))
-        red_mask2 = cv2.inRange(hsv, (170, 70, 50), (180, 255, 255))
-        red_mask = cv2.bitwise_or(red_mask1, red_mask2)
-        # Purple mask
-        purple_mask = cv2.inRange(hsv, (125, 50, 50), (160, 255, 255))
-        # Yellow mask
-        yellow_mask = cv2.inRange(hsv, (15, 50, 50), (35, 255, 255))
-
-        # Combine all color masks
-        combined_mask = cv2.bitwise_or(green_mask, red_mask)
-        combined_mask = cv2.bitwise_or(combined_mask, purple_mask)
-        combined_mask = cv2.bitwise_or(combined_mask, yellow_mask)
-
-        # Calculate the percentage of plant-like pixels
-        plant_percentage = (cv2.countNonZero(combined_mask) / (img.shape[0] * img.shape[1])) * 100
-        
-        # If the percentage is above a threshold, assume a plant is present
-        return plant_percentage > 5  # Threshold of 5% plant-like pixels
+    Images of any resolution are accepted: colour statistics are computed on a subsample
+    of about ANALYSIS_PIXELS pixels, so larger inputs cost little more than the subsample.
+    """
+
+    def __init__(self):
+        # Build the colour table with the analyzer (once per process) so the first
+        # analysis doesn't pay for it
+        _colour_table()
+
+    def detect_plant(self, img: np.ndarray, hist: np.ndarray = None) -> bool:
+        """Detect if a plant is present in the image based on a wider range of plant-like colors.
+
+        Pass the image's band_histogram as hist to reuse it across calls.
+        """
+        # Plant-like colours: greens, reds, purples and yellows
+        if hist is None:
+            hist = band_histogram(img)
+
+        # If more than 5% of the pixels are plant-like, assume a plant is present.
+        # Compared as counts (plant / total > 5 / 100) so no division is needed.
+        return band_count(hist, PLANT_BANDS) * 100 > 5 * int(hist.sum())
 
     def get_chlorophyll_info(self) -> str:
         """Return information about chlorophyll."""
@@ -41,35 +184,23 @@ class PlantImageAnalyzer:
             "leading to red, purple, or yellow leaves. These plants still have chlorophyll and photosynthesize."
         )
 
-    def analyze_plant_health(self, img: np.ndarray) -> Dict:
-        """Analyze plant health based on color segmentation, including a wider range of healthy colors."""
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Define masks for various healthy plant colors (green, red, purple)
-        # Green mask
-        green_mask = cv2.inRange(hsv, (30, 40, 40), (90, 255, 255))
-        # Red mask (for red-leafed plants)
-        red_mask1 = cv2.inRange(hsv, (0, 70, 50), (10, 255, 255))
-        red_mask2 = cv2.inRange(hsv, (170, 70, 50), (180, 255, 255))
-        red_mask = cv2.bitwise_or(red_mask1, red_mask2)
-        # Purple mask
-        purple_mask = cv2.inRange(hsv, (125, 50, 50), (160, 255, 255))
-        
-        # Combine healthy masks
-        healthy_mask = cv2.bitwise_or(green_mask, red_mask)
-        healthy_mask = cv2.bitwise_or(healthy_mask, purple_mask)
-        
-        # Yellow mask for potentially unhealthy parts
-        yellow_mask = cv2.inRange(hsv, (15, 50, 50), (35, 255, 255))
-        # Brown mask for dead or dying parts
-        brown_mask = cv2.inRange(hsv, (10, 100, 20), (20, 255, 200))
+    def analyze_plant_health(self, img: np.ndarray, hist: np.ndarray = None) -> Dict:
+        """Analyze plant health based on color segmentation, including a wider range of healthy colors.
+
+        Pass the image's band_histogram as hist to reuse it across calls.
+        """
+        # Healthy colours (green, red, purple), yellow for potentially unhealthy parts
+        # and brown for dead or dying parts
+        if hist is None:
+            hist = band_histogram(img)
         
-        total_pixels = img.shape[0] * img.shape[1]
+        # Scale counts to percentages with one division instead of one per band
+        to_pct = 100.0 / int(hist.sum())
         
         # Calculate percentages
-        healthy_pct = (cv2.countNonZero(healthy_mask) / total_pixels) * 100
-        yellow_pct = (cv2.countNonZero(yellow_mask) / total_pixels) * 100
-        brown_pct = (cv2.countNonZero(brown_mask) / total_pixels) * 100
+        healthy_pct = band_count(hist, HEALTHY_BANDS) * to_pct
+        yellow_pct = band_count(hist, YELLOW) * to_pct
+        brown_pct = band_count(hist, BROWN) * to_pct
         
         return {
             'healthy_percentage': healthy_pct,
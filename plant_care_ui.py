@@ -0,0 +1,110 @@
+import re
+import cv2
+import numpy as np
+from typing import Dict, Any
+from plant_analysis import JPEG_MAGIC
+
+# Image preparation and result packing for the app's analyze path. Kept free of
+# Streamlit so the same encode/decode logic serves every caller.
+
+# Leading bullet or "1." style number on an LLM recommendation line
+LIST_MARKER = re.compile(r'^(?:[-*•]|\d+\.(?!\d))\s*')
+
+def utf8_text(value) -> str:
+    """Return text that is safe to display, forcing UTF-8 for bytes and odd code points.
+
+    ASCII strings are returned as they are (str.isascii only checks a flag); other text
+    goes through a UTF-8 encode/decode round trip that replaces lone surrogates.
+    """
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    text = str(value)
+    if text.isascii():
+        return text
+    return text.encode('utf-8', errors='replace').decode('utf-8', errors='replace')
+
+def encode_jpeg(img_bgr: np.ndarray, quality: int = 85) -> bytes:
+    """Encode a BGR image array as JPEG bytes using OpenCV's libjpeg-turbo encoder."""
+    ok, buf = cv2.imencode('.jpg', img_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Failed to encode image as JPEG")
+    return buf.tobytes()
+
+def resize_for_llm(img: np.ndarray, max_side: int = 1024) -> np.ndarray:
+    """Downscale an image so its longest edge is at most max_side pixels."""
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """Decode uploaded image bytes straight to a BGR array with OpenCV."""
+    img_bgr = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img_bgr is None:
+        raise ValueError("Unsupported or corrupted image file")
+    return img_bgr
+
+def prepare_jpeg(image_source, max_side: int = 1024, img_bgr: np.ndarray = None) -> bytes:
+    """Return the JPEG bytes the agent analyzes for raw image bytes, a BGR array or a PIL image.
+
+    Args:
+        image_source: Raw image bytes, a BGR array or a PIL image
+        max_side: Longest edge, in pixels, of the image sent to the LLM
+        img_bgr: Decoded array for image_source bytes, if the caller already has it
+
+    Returns:
+        JPEG encoded bytes
+    """
+    if isinstance(image_source, bytes):
+        # JPEGs that already fit are sent as-is; without an array there is nothing to resize
+        if image_source[:3] == JPEG_MAGIC and (img_bgr is None or max(img_bgr.shape[:2]) <= max_side):
+            return image_source
+        if img_bgr is None:
+            img_bgr = decode_image(image_source)
+    elif isinstance(image_source, np.ndarray):
+        img_bgr = image_source
+    else:
+        # PIL image: a reversed channel view gives OpenCV its BGR order without a copy
+        img_bgr = np.asarray(image_source.convert('RGB'))[..., ::-1]
+    return encode_jpeg(resize_for_llm(img_bgr, max_side))
+
+def pack_result(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten an agent analysis into the values the results view renders.
+
+    Runs once when a result arrives so later reruns only re-render the stored values.
+    """
+    if analysis.get('status') != 'success':
+        return {'status': 'error', 'message': analysis.get('message', 'Unknown error')}
+
+    health = analysis.get('health_analysis') or {}
+    recommendations = []
+    for rec in analysis.get('recommendations') or ():
+        rec_text = LIST_MARKER.sub('', rec.strip(), count=1)
+        if not rec_text:
+            continue
+        # Force UTF-8 for display
+        recommendations.append(utf8_text(rec_text))
+
+    return {
+        'status': 'success',
+        # False when the agent fell back to placeholder LLM output; such results aren't cached
+        'llm_complete': analysis.get('llm_complete', False),
+        'species': analysis.get('species'),
+        'health_score': health.get('healthy_percentage', 0),
+        'yellow_percentage': health.get('yellow_percentage', 0),
+        'brown_percentage': health.get('brown_percentage', 0),
+        'recommendations': recommendations,
+    }
+
+def analyze(agent, image_source, max_side: int = 1024) -> Dict[str, Any]:
+    """Run the agent's image analysis on any supported image source and pack the result."""
+    try:
+        # Base64 strings go to the agent as they are; everything else as JPEG bytes, which
+        # the agent analyzes without a base64 round trip
+        if not isinstance(image_source, str):
+            image_source = prepare_jpeg(image_source, max_side)
+        analysis = agent.analyze_image(image_source)
+    except Exception as e:
+        analysis = {'status': 'error', 'message': f"Error during analysis: {str(e)}"}
+    return pack_result(analysis)
@@ -3,13 +3,17 @@ import sys
 import io
 import os
 import locale
+import hashlib
 from pathlib import Path
-from PIL import Image
 import cv2
 import numpy as np
-import base64
+import queue
+import tempfile
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime
 from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
 
 # Add the current directory to the Python path FIRST
 sys.path.append(str(Path(__file__).parent))
@@ -51,14 +55,120 @@ except ImportError as e:
     st.error("Please make sure packages.py exists and is in the same directory.")
     st.stop()
 
+try:
+    from plant_care_ui import analyze, decode_image, prepare_jpeg, utf8_text
+except ImportError as e:
+    st.error(f"Failed to import image helpers: {e}")
+    st.error("Please make sure plant_care_ui.py exists and is in the same directory.")
+    st.stop()
+
+try:
+    from email_agent import send_welcome_email
+except ImportError as e:
+    st.error(f"Failed to import email functions: {e}")
+    st.error("Please make sure email_agent.py exists and is in the same directory.")
+    st.stop()
+
+# Number of finished analyses remembered per session, keyed by agent and image content
+ANALYSIS_CACHE_SIZE = 32
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _prepare_image_jpeg(image_bytes: bytes, max_side: int, _img_bgr=None) -> bytes:
+    """Return the JPEG bytes sent for analysis, cached on the raw upload bytes.
+
+    The decoded BGR array is excluded from the cache key. Camera captures are already
+    browser-encoded JPEGs and are passed with no array, so they are never decoded here.
+    """
+    return prepare_jpeg(image_bytes, max_side, _img_bgr)
+
+@st.cache_resource(max_entries=3, show_spinner=False)
+def get_plant_care_agent(provider: str, api_key: str):
+    """Build a PlantCareAgent once per provider and API key and reuse it across reruns."""
+    return PlantCareAgent(api_key=api_key, provider=provider)
+
+@st.cache_resource(show_spinner=False)
+def initialize_user_db():
+    """Create the users table once per process instead of on every rerun."""
+    initialize_db()
+
+@st.cache_resource
+def load_css(path="style.css"):
+    """Read the app stylesheet once per process and wrap it in a <style> tag."""
+    with open(path) as f:
+        return f"<style>{f.read()}</style>"
+
+class AnalysisWorker:
+    """Runs plant image analysis on a background thread so reruns never block on the LLM.
+
+    Submitted images go into a single-slot queue: a newer capture replaces one that has
+    not been picked up yet, so the worker always analyzes the most recent image. Finished
+    analyses are collected from the results queue on a later rerun, tagged with the key
+    they were submitted under.
+    """
+
+    IDLE_TIMEOUT = 30  # seconds before an idle worker thread exits
+
+    def __init__(self):
+        self.frames = queue.Queue(maxsize=1)
+        self.results = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, agent, image, key=None):
+        """Queue an encoded image for analysis, dropping any stale pending frame."""
+        item = (agent, image, key)
+        try:
+            self.frames.get_nowait()
+        except queue.Empty:
+            pass
+        self.frames.put_nowait(item)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def poll(self):
+        """Return the next finished (key, packed result) pair, or None if nothing is ready."""
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        while True:
+            try:
+                agent, image, key = self.frames.get(timeout=self.IDLE_TIMEOUT)
+            except queue.Empty:
+                # Decide to exit under the lock so a frame submitted meanwhile either gets
+                # picked up here or finds no thread and starts a new one
+                with self._lock:
+                    if self.frames.empty():
+                        self._thread = None
+                        return
+                continue
+            self.results.put((key, analyze(agent, image)))
+
 def initialize_session_state():
     """Initialize session state variables."""
     if 'plant_agent' not in st.session_state:
         st.session_state.plant_agent = None
     if 'agent_initialized' not in st.session_state:
         st.session_state.agent_initialized = False
-    if 'uploaded_image' not in st.session_state:
-        st.session_state.uploaded_image = None
+    if 'image_array' not in st.session_state:
+        st.session_state.image_array = None
+    if 'uploaded_bytes' not in st.session_state:
+        st.session_state.uploaded_bytes = None
+    if 'analysis_worker' not in st.session_state:
+        st.session_state.analysis_worker = AnalysisWorker()
+    if 'analysis_pending' not in st.session_state:
+        st.session_state.analysis_pending = False
+    if 'analysis_result' not in st.session_state:
+        st.session_state.analysis_result = None
+    if 'analysis_key' not in st.session_state:
+        # Key of the most recently requested analysis; only its result is displayed
+        st.session_state.analysis_key = None
+    if 'analysis_cache' not in st.session_state:
+        st.session_state.analysis_cache = OrderedDict()
     if 'api_key' not in st.session_state:
         st.session_state.api_key = ""
     if 'provider' not in st.session_state:
@@ -67,6 +177,16 @@ def initialize_session_state():
         st.session_state.messages = [
             {"role": "assistant", "content": "Hello! I'm your Plant Care Assistant. How can I help you with your plants today?"}
         ]
+    if 'chat_context' not in st.session_state:
+        # The same turns as LLM messages, converted once as they are added and capped at
+        # the history the agent sends, so chat turns don't rebuild them
+        st.session_state.chat_context = deque(
+            ((HumanMessage if m["role"] == "user" else AIMessage)(content=m["content"])
+             for m in st.session_state.messages),
+            maxlen=PlantCareAgent.MAX_HISTORY_MESSAGES
+        )
+    if 'max_image_side' not in st.session_state:
+        st.session_state.max_image_side = 1024
     if 'gemini_search_count' not in st.session_state:
         st.session_state.gemini_search_count = 0
     if 'logged_in' not in st.session_state:
@@ -163,16 +283,22 @@ def display_sidebar():
         if st.button("Initialize Agent", disabled=button_disabled):
             try:
                 with st.spinner("Initializing Plant Care Agent..."):
-                    st.session_state.plant_agent = PlantCareAgent(
-                        api_key=api_key,
-                        provider=provider
-                    )
+                    st.session_state.plant_agent = get_plant_care_agent(provider, api_key)
                     st.session_state.agent_initialized = True
                     st.success("✅ Plant Care Agent initialized successfully!")
             except Exception as e:
                 st.error(f"Error initializing Plant Care Agent: {str(e)}")
                 st.session_state.agent_initialized = False
 
+        # Image size sent to the LLM
+        st.subheader("Image Settings")
+        st.session_state.max_image_side = st.select_slider(
+            "Max image size for analysis (px)",
+            options=[512, 1024, 1536],
+            value=st.session_state.max_image_side,
+            help="Larger photos are downscaled before being sent to the LLM. Smaller sizes upload and analyze faster."
+        )
+
         # Status indicators
         st.subheader("Status")
         if st.session_state.agent_initialized:
@@ -194,9 +320,7 @@ def display_sidebar():
         - 🔍 Identify plant health issues
         """)
         if st.session_state.logged_in:
-            if st.button("Logout"):
-                st.session_state.logged_in = False
-                st.rerun()
+            st.button("Logout", on_click=_logout)
 
 def display_upload_section():
     """Display the image upload and analysis section."""
@@ -224,7 +348,6 @@ def display_upload_section():
     video_to_use = None
     if uploaded_video is not None:
         # Save video to a temp file
-        import tempfile
         with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_vid:
             tmp_vid.write(uploaded_video.read())
             video_path = tmp_vid.name
@@ -233,19 +356,22 @@ def display_upload_section():
         video_to_use = video_path
     elif camera_image is not None:
         try:
-            image = Image.open(camera_image)
-            st.image(image.decode('utf-8'), caption="Camera Plant Image", width='stretch')
-            st.session_state.uploaded_image = image
-            image_to_use = image
+            # The camera already delivers JPEG bytes: display and send them without decoding
+            st.session_state.uploaded_bytes = camera_image.getvalue()
+            st.image(camera_image, caption="Camera Plant Image", width='stretch')
+            st.session_state.image_array = None
+            image_to_use = camera_image
         except Exception as e:
             st.error(f"Error loading camera image: {str(e)}")
             return
     elif uploaded_file is not None:
         try:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Plant Image", width='stretch')
-            st.session_state.uploaded_image = image
-            image_to_use = image
+            st.session_state.uploaded_bytes = uploaded_file.getvalue()
+            img_bgr = decode_image(st.session_state.uploaded_bytes)
+            st.image(img_bgr, channels="BGR", caption="Uploaded Plant Image", width='stretch')
+            # The agent receives the JPEG-encoded buffer; this array is only used to re-encode
+            st.session_state.image_array = img_bgr
+            image_to_use = img_bgr
         except Exception as e:
             st.error(f"Error loading image: {str(e)}")
             return
@@ -264,6 +390,10 @@ def display_upload_section():
         else:
             analyze_plant_image()
 
+    # Poll the background worker only while an analysis is in flight
+    run_every = 1.0 if st.session_state.analysis_pending else None
+    st.fragment(display_analysis_status, run_every=run_every)()
+
 def analyze_plant_video(video_path):
     """Analyze the first frame of the uploaded plant video."""
     if not video_path:
@@ -284,61 +414,98 @@ def analyze_plant_video(video_path):
             st.error(f"Error during video analysis: {str(e)}")
 
 def analyze_plant_image():
-    """Analyze the uploaded plant image."""
-    if 'uploaded_image' not in st.session_state:
+    """Queue the uploaded plant image for analysis on the background worker."""
+    if st.session_state.uploaded_bytes is None:
         st.warning("Please upload an image first")
         return
-    
-    with st.spinner("Analyzing your plant..."):
-        try:
-            # Convert image to base64
-            buffered = io.BytesIO()
-            st.session_state.uploaded_image.save(buffered, format="JPEG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            
-            # Get analysis from the agent
-            if st.session_state.agent_initialized and st.session_state.plant_agent:
-                analysis = st.session_state.plant_agent.analyze_image(img_str)
-                display_analysis_results(analysis)
-            else:
-                st.error("Plant Care Agent is not initialized")
-                
-        except Exception as e:
-            st.error(f"Error during analysis: {str(e)}")
+    if not (st.session_state.agent_initialized and st.session_state.plant_agent):
+        st.error("Plant Care Agent is not initialized")
+        return
+
+    # Unchanged images analyzed by the same agent (provider and API key) are served from
+    # the session cache
+    key = (
+        id(st.session_state.plant_agent),
+        st.session_state.max_image_side,
+        hashlib.blake2b(st.session_state.uploaded_bytes, digest_size=16).digest()
+    )
+    st.session_state.analysis_key = key
+    cache = st.session_state.analysis_cache
+    if key in cache:
+        cache.move_to_end(key)
+        st.session_state.analysis_result = cache[key]
+        st.session_state.analysis_pending = False
+        return
+
+    try:
+        # Downscale and JPEG-encode the image for the LLM
+        img_jpeg = _prepare_image_jpeg(
+            st.session_state.uploaded_bytes,
+            st.session_state.max_image_side,
+            st.session_state.image_array
+        )
+    except Exception as e:
+        st.error(f"Error during analysis: {str(e)}")
+        return
 
-def display_analysis_results(analysis):
-    """Display the analysis results in a user-friendly format."""
+    st.session_state.analysis_worker.submit(st.session_state.plant_agent, img_jpeg, key)
+    st.session_state.analysis_pending = True
+
+def display_analysis_status():
+    """Collect finished background analyses and display the latest result."""
+    latest_finished = False
+    while True:
+        finished = st.session_state.analysis_worker.poll()
+        if finished is None:
+            break
+        key, result = finished
+        if result['status'] == 'success' and result['llm_complete']:
+            cache = st.session_state.analysis_cache
+            cache[key] = result
+            if len(cache) > ANALYSIS_CACHE_SIZE:
+                cache.popitem(last=False)
+        # Results for images submitted before the latest one are only cached
+        if key == st.session_state.analysis_key:
+            st.session_state.analysis_result = result
+            st.session_state.analysis_pending = False
+            latest_finished = True
+    if latest_finished:
+        # run_every is only applied on a full app run, so rerun the app to stop polling
+        st.rerun(scope="app")
+
+    if st.session_state.analysis_pending:
+        st.info("🔍 Analyzing your plant...")
+    elif st.session_state.analysis_result is not None:
+        display_analysis_results(st.session_state.analysis_result)
+
+def display_analysis_results(result):
+    """Display a packed analysis result in a user-friendly format."""
     try:
-        if analysis.get('status') == 'success':
+        if result['status'] == 'success':
             st.success("Analysis complete! 🎉")
             
             # Display species
-            if 'species' in analysis:
+            if result['species'] is not None:
                 st.subheader("🌿 Plant Species")
-                st.write(analysis['species'])
+                st.write(result['species'])
 
             # Display health metrics
-            health = analysis.get('health_analysis', {})
             st.subheader("🌱 Plant Health Summary")
             # Create columns for metrics
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Health Score", f"{health.get('healthy_percentage', 0):.1f}%")
+                st.metric("Health Score", f"{result['health_score']:.1f}%")
             with col2:
-                st.metric("Yellowing", f"{health.get('yellow_percentage', 0):.1f}%")
+                st.metric("Yellowing", f"{result['yellow_percentage']:.1f}%")
             with col3:
-                st.metric("Browning", f"{health.get('brown_percentage', 0):.1f}%")
+                st.metric("Browning", f"{result['brown_percentage']:.1f}%")
             # Display care recommendations
-            if 'recommendations' in analysis:
+            if result['recommendations']:
                 st.subheader("💡 Care Recommendations")
-                for rec in analysis['recommendations']:
-                    rec_text = rec.strip()
-                    if rec_text.startswith(('-', '*', '•', '1.', '2.', '3.', '4.', '5.')):
-                        rec_text = rec_text[1:].strip()
-                    # Force UTF-8 for display
-                    st.info(f"• {rec_text.encode('utf-8', errors='replace').decode('utf-8', errors='replace')}")
+                for rec_text in result['recommendations']:
+                    st.info(f"• {rec_text}")
         else:
-            st.error(f"Analysis failed: {analysis.get('message', 'Unknown error')}")
+            st.error(f"Analysis failed: {result['message']}")
     except Exception as e:
         st.error(f"Unicode error displaying analysis: {str(e)}")
 
@@ -351,12 +518,7 @@ def display_chat_interface():
         with st.chat_message(message["role"]):
             try:
                 # Always force UTF-8 for display
-                content = message["content"]
-                if isinstance(content, bytes):
-                    content = content.decode('utf-8', errors='replace')
-                else:
-                    content = str(content).encode('utf-8', errors='replace').decode('utf-8', errors='replace')
-                st.markdown(content)
+                st.markdown(utf8_text(message["content"]))
             except Exception as e:
                 st.markdown(f"[Unicode error displaying message: {e}]")
 
@@ -366,41 +528,35 @@ def display_chat_interface():
     if prompt is not None:
         try:
             # Force UTF-8 for input
-            if isinstance(prompt, bytes):
-                prompt = prompt.decode('utf-8', errors='replace')
-            else:
-                prompt = str(prompt).encode('utf-8', errors='replace').decode('utf-8', errors='replace')
+            prompt = utf8_text(prompt)
         except Exception:
             pass
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
-
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Generate and display assistant response
+        # Generate and stream the assistant response
+        response = None
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    if st.session_state.agent_initialized and st.session_state.plant_agent:
-                        response = st.session_state.plant_agent.chat(
-                            message=prompt,
-                            chat_history=st.session_state.messages[:-1]
-                        )
-                        # Always force UTF-8 for output
-                        if isinstance(response, bytes):
-                            response = response.decode('utf-8', errors='replace')
-                        else:
-                            response = str(response).encode('utf-8', errors='replace').decode('utf-8', errors='replace')
-                        st.markdown(response)
-                        st.session_state.messages.append({"role": "assistant", "content": response})
-                    else:
-                        st.error("Plant Care Agent is not initialized")
-                except Exception as e:
-                    error_msg = f"Sorry, I encountered an error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+            try:
+                if st.session_state.agent_initialized and st.session_state.plant_agent:
+                    # The history is passed as-is; the new prompt is only appended after the call
+                    response = st.write_stream(st.session_state.plant_agent.chat_stream(
+                        message=prompt,
+                        chat_history=st.session_state.chat_context
+                    ))
+                else:
+                    st.error("Plant Care Agent is not initialized")
+            except Exception as e:
+                response = f"Sorry, I encountered an error: {str(e)}"
+                st.error(response)
+
+        # Add the exchange to chat history
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.chat_context.append(HumanMessage(content=prompt))
+        if response is not None:
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.chat_context.append(AIMessage(content=response))
 
 def main():
     # Set page config
@@ -411,11 +567,10 @@ def main():
         initial_sidebar_state="expanded"
     )
     
-    with open("style.css") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    st.markdown(load_css(), unsafe_allow_html=True)
 
     initialize_session_state()
-    initialize_db()
+    initialize_user_db()
 
     if not st.session_state.logged_in:
         display_login_page()
@@ -446,37 +601,51 @@ def display_login_page():
     
     choice = st.selectbox("Choose an action", ["Login", "Register"])
     
-    username = st.text_input("Username")
+    username = st.text_input("Username", key="login_username")
     if choice == "Register":
         email = st.text_input("Email")
-    password = st.text_input("Password", type="password")
+    password = st.text_input("Password", type="password", key="login_password")
     
     if choice == "Register":
         if st.button("Register"):
             if register_user(username, email, password):
-                from email_agent import send_welcome_email
                 send_welcome_email(email, username)
                 st.success("Registration successful! Please login.")
             else:
                 st.error("Username or email already exists.")
     else:
-        if st.button("Login"):
-            if login_user(username, password):
-                st.session_state.logged_in = True
-                st.session_state.username = username
-                st.rerun()
-            else:
-                st.error("Invalid username or password.")
+        st.button("Login", on_click=_login)
+        if st.session_state.pop('login_failed', False):
+            st.error("Invalid username or password.")
+
+# Login state changes run as button callbacks, which Streamlit executes before the
+# rerun triggered by the click, so the page renders in its new state without an
+# extra st.rerun() pass.
+def _login():
+    username = st.session_state.login_username
+    if login_user(username, st.session_state.login_password):
+        st.session_state.logged_in = True
+        st.session_state.username = username
+    else:
+        st.session_state.login_failed = True
+
+def _logout():
+    st.session_state.logged_in = False
+
+# The catalogue is static, so each package's feature list is built once per process and
+# sent as one markdown element instead of one element per feature on every rerun.
+PACKAGE_FEATURES_MD = tuple(
+    "\n".join(f"- {feature}" for feature in package["features"]) for package in PACKAGES
+)
 
 def display_packages():
     st.header("Subscription Packages")
     
-    for package in PACKAGES:
+    for package, features_md in zip(PACKAGES, PACKAGE_FEATURES_MD):
         with st.container():
             st.subheader(package["name"])
             st.metric("Price", package["price"])
-            for feature in package["features"]:
-                st.markdown(f"- {feature}")
+            st.markdown(features_md)
             st.link_button("Subscribe", package["payment_link"])
 
 